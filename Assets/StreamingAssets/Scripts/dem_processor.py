@@ -5,8 +5,6 @@ Converts DEM (Digital Elevation Model) files to Unity-compatible heightmaps
 
 import sys
 import os
-import numpy as np
-from PIL import Image
 
 try:
     from osgeo import gdal
@@ -33,43 +31,34 @@ def process_dem_to_heightmap(dem_path, output_path, resolution=513):
     if dataset is None:
         print(f"ERROR: Could not open DEM file: {dem_path}")
         sys.exit(1)
-    
-    # Read elevation data
+
+    print(f"DEM shape: ({dataset.RasterYSize}, {dataset.RasterXSize})")
+
+    # Elevation range from GDAL statistics (approximate is fine for
+    # scaling; uses overviews/cached stats when available)
     band = dataset.GetRasterBand(1)
-    elevation_data = band.ReadAsArray()
-    
-    print(f"DEM shape: {elevation_data.shape}")
-    print(f"Elevation range: {np.min(elevation_data)} to {np.max(elevation_data)}")
-    
-    # Normalize elevation data to 0-1 range
-    min_elev = np.min(elevation_data)
-    max_elev = np.max(elevation_data)
-    
+    min_elev, max_elev, _, _ = band.GetStatistics(True, True)
+    print(f"Elevation range: {min_elev} to {max_elev}")
+
     if max_elev == min_elev:
-        normalized = np.zeros_like(elevation_data)
-    else:
-        normalized = (elevation_data - min_elev) / (max_elev - min_elev)
-    
-    # Resize to target resolution
-    from scipy import ndimage
-    zoom_factor = (resolution / elevation_data.shape[0], resolution / elevation_data.shape[1])
-    resized = ndimage.zoom(normalized, zoom_factor, order=1)
-    
-    # Convert to 16-bit grayscale image
-    heightmap = (resized * 65535).astype(np.uint16)
-    
-    # Save as PNG
-    image = Image.fromarray(heightmap, mode='I;16')
-    
+        max_elev = min_elev + 1.0  # avoid a degenerate scale
+
     # Ensure output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    image.save(output_path)
+
+    # Decode, rescale, resample and encode in a single GDAL C call -
+    # no NumPy/PIL round-trip through Python at all
+    gdal.Translate(output_path, dataset,
+                   format='PNG',
+                   outputType=gdal.GDT_UInt16,
+                   width=resolution, height=resolution,
+                   scaleParams=[[min_elev, max_elev, 0, 65535]],
+                   resampleAlg='bilinear')
     print(f"Heightmap saved successfully: {output_path}")
-    
+
     # Close dataset
     dataset = None
-    
+
     return output_path
 
 
@@ -9,6 +9,8 @@ import os
 import numpy as np
 from PIL import Image
 
+from utils.image_utils import normalize_to_uint16
+
 # Try to import GDAL, fall back to rasterio
 GDAL_AVAILABLE = False
 RASTERIO_AVAILABLE = False
@@ -34,81 +36,64 @@ except ImportError:
 
 def process_dem_with_gdal(dem_path, output_path, resolution=513):
     """Process DEM using GDAL"""
-    dataset = gdal.Open(dem_path)
-    if dataset is None:
-        print(f"ERROR: Could not open DEM file: {dem_path}")
-        sys.exit(1)
-    
-    band = dataset.GetRasterBand(1)
-    elevation_data = band.ReadAsArray()
-    
+    from utils.gdal_helper import open_dataset
+
+    with open_dataset(dem_path) as dataset:
+        if dataset is None:
+            print(f"ERROR: Could not open DEM file: {dem_path}")
+            sys.exit(1)
+
+        # Resample to target resolution with GDAL's native bilinear resampler
+        # (only the target grid is materialized, no full-resolution NumPy copy)
+        warped = gdal.Warp('', dataset, format='MEM',
+                           width=resolution, height=resolution,
+                           resampleAlg='bilinear')
+        elevation_data = warped.GetRasterBand(1).ReadAsArray()
+        warped = None
+
     print(f"DEM shape: {elevation_data.shape}")
-    print(f"Elevation range: {np.min(elevation_data)} to {np.max(elevation_data)}")
-    
-    # Normalize elevation data to 0-1 range
-    min_elev = np.min(elevation_data)
-    max_elev = np.max(elevation_data)
-    
-    if max_elev == min_elev:
-        normalized = np.zeros_like(elevation_data)
-    else:
-        normalized = (elevation_data - min_elev) / (max_elev - min_elev)
-    
-    # Resize to target resolution
-    from scipy import ndimage
-    zoom_factor = (resolution / elevation_data.shape[0], resolution / elevation_data.shape[1])
-    resized = ndimage.zoom(normalized, zoom_factor, order=1)
-    
-    # Convert to 16-bit grayscale image
-    heightmap = (resized * 65535).astype(np.uint16)
-    
+
+    # Normalize to 0-65535 and cast in a single fused pass
+    heightmap, min_elev, max_elev = normalize_to_uint16(elevation_data)
+    print(f"Elevation range: {min_elev} to {max_elev}")
+
     # Save as PNG
     image = Image.fromarray(heightmap, mode='I;16')
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    image.save(output_path)
-    
+    image.save(output_path, 'PNG', compress_level=3, optimize=False)
+
     print(f"Heightmap saved successfully: {output_path}")
-    dataset = None
     return output_path
 
 
 def process_dem_with_rasterio(dem_path, output_path, resolution=513):
     """Process DEM using rasterio (easier Windows installation)"""
     with rasterio.open(dem_path) as dataset:
-        elevation_data = dataset.read(1)
-        
+        # Let rasterio's C resampler decimate to the target grid during the
+        # read instead of reading full-res and zooming in Python. masked=True
+        # resamples the nodata mask alongside the data - equality-testing the
+        # decimated values would miss voids bilinear blending smeared into
+        # their neighbors
+        masked = dataset.read(
+            1,
+            out_shape=(resolution, resolution),
+            resampling=Resampling.bilinear,
+            masked=True
+        )
+        elevation_data = masked.data
+        invalid_mask = np.ma.getmaskarray(masked)
+
         print(f"DEM shape: {elevation_data.shape}")
-        print(f"Elevation range: {np.min(elevation_data)} to {np.max(elevation_data)}")
-        
-        # Handle nodata values
-        nodata = dataset.nodata
-        if nodata is not None:
-            elevation_data = np.where(elevation_data == nodata, np.nan, elevation_data)
-        
-        # Normalize elevation data to 0-1 range
-        min_elev = np.nanmin(elevation_data)
-        max_elev = np.nanmax(elevation_data)
-        
-        if max_elev == min_elev:
-            normalized = np.zeros_like(elevation_data)
-        else:
-            normalized = (elevation_data - min_elev) / (max_elev - min_elev)
-        
-        # Replace NaN with 0
-        normalized = np.nan_to_num(normalized, nan=0.0)
-        
-        # Resize to target resolution
-        from scipy import ndimage
-        zoom_factor = (resolution / elevation_data.shape[0], resolution / elevation_data.shape[1])
-        resized = ndimage.zoom(normalized, zoom_factor, order=1)
-        
-        # Convert to 16-bit grayscale image
-        heightmap = (resized * 65535).astype(np.uint16)
+
+        # Normalize to 0-65535 and cast in a single fused pass (nodata -> 0)
+        heightmap, min_elev, max_elev = normalize_to_uint16(
+            elevation_data, invalid_mask=invalid_mask)
+        print(f"Elevation range: {min_elev} to {max_elev}")
         
         # Save as PNG
         image = Image.fromarray(heightmap, mode='I;16')
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        image.save(output_path)
+        image.save(output_path, 'PNG', compress_level=3, optimize=False)
         
         print(f"Heightmap saved successfully: {output_path}")
         return output_path
@@ -2,41 +2,64 @@
 GDAL helper functions for DEM processing
 """
 
+from contextlib import contextmanager
+
 from osgeo import gdal, osr
 import numpy as np
 
 
+@contextmanager
+def open_dataset(dem_path, access=gdal.GA_ReadOnly):
+    """
+    Open a GDAL dataset as a context manager
+
+    Drops the wrapper's own reference on every exit path, including
+    exceptions - unlike plain `dataset = None` cleanup, which is skipped
+    when an error is raised mid-function. The caller's `as` binding
+    still keeps the dataset alive until it dies or is deleted.
+
+    Args:
+        dem_path: Path to raster file
+        access: GDAL access mode (default: read-only)
+
+    Yields:
+        gdal.Dataset or None if the file could not be opened
+    """
+    dataset = gdal.Open(dem_path, access)
+    try:
+        yield dataset
+    finally:
+        dataset = None
+
+
 def get_dem_info(dem_path):
     """
     Get information about a DEM file
-    
+
     Args:
         dem_path: Path to DEM file
-        
+
     Returns:
         dict: DEM information
     """
-    dataset = gdal.Open(dem_path)
-    if dataset is None:
-        return None
-    
-    band = dataset.GetRasterBand(1)
-    geotransform = dataset.GetGeoTransform()
-    projection = dataset.GetProjection()
-    
-    info = {
-        'width': dataset.RasterXSize,
-        'height': dataset.RasterYSize,
-        'bands': dataset.RasterCount,
-        'min_elevation': band.GetMinimum(),
-        'max_elevation': band.GetMaximum(),
-        'nodata_value': band.GetNoDataValue(),
-        'geotransform': geotransform,
-        'projection': projection
-    }
-    
-    dataset = None
-    return info
+    with open_dataset(dem_path) as dataset:
+        if dataset is None:
+            return None
+
+        band = dataset.GetRasterBand(1)
+        geotransform = dataset.GetGeoTransform()
+        projection = dataset.GetProjection()
+
+        return {
+            'width': dataset.RasterXSize,
+            'height': dataset.RasterYSize,
+            'bands': dataset.RasterCount,
+            'min_elevation': band.GetMinimum(),
+            'max_elevation': band.GetMaximum(),
+            'nodata_value': band.GetNoDataValue(),
+            'geotransform': geotransform,
+            'projection': projection
+        }
 
 
 def reproject_dem(input_path, output_path, target_srs='EPSG:4326'):
@@ -48,16 +71,13 @@ def reproject_dem(input_path, output_path, target_srs='EPSG:4326'):
         output_path: Output DEM path
         target_srs: Target SRS (default: WGS84)
     """
-    src_ds = gdal.Open(input_path)
-    
-    # Define target SRS
-    dst_srs = osr.SpatialReference()
-    dst_srs.ImportFromEPSG(int(target_srs.split(':')[1]))
-    
-    # Reproject
-    gdal.Warp(output_path, src_ds, dstSRS=dst_srs.ExportToWkt())
-    
-    src_ds = None
+    with open_dataset(input_path) as src_ds:
+        # Define target SRS
+        dst_srs = osr.SpatialReference()
+        dst_srs.ImportFromEPSG(int(target_srs.split(':')[1]))
+
+        # Reproject
+        gdal.Warp(output_path, src_ds, dstSRS=dst_srs.ExportToWkt())
 
 
 def clip_dem(input_path, output_path, bounds):
@@ -69,10 +89,7 @@ def clip_dem(input_path, output_path, bounds):
         output_path: Output DEM path
         bounds: (min_lon, min_lat, max_lon, max_lat)
     """
-    src_ds = gdal.Open(input_path)
-    
-    # Clip using translate
-    gdal.Translate(output_path, src_ds, 
-                   projWin=[bounds[0], bounds[3], bounds[2], bounds[1]])
-    
-    src_ds = None
+    with open_dataset(input_path) as src_ds:
+        # Clip using translate
+        gdal.Translate(output_path, src_ds,
+                       projWin=[bounds[0], bounds[3], bounds[2], bounds[1]])
@@ -10,37 +10,83 @@ from scipy import ndimage
 def apply_gaussian_blur(heightmap, sigma=1.0):
     """
     Apply Gaussian blur to heightmap
-    
+
+    Runs the separable 1-D kernels truncated at 3 sigma instead of the
+    default 4 sigma (25% fewer taps, visually identical for terrain) and
+    forces float32 input so the convolution never runs in float64.
+
     Args:
         heightmap: Input heightmap array
         sigma: Blur strength
-        
+
     Returns:
-        Blurred heightmap
+        Blurred heightmap (float32)
     """
-    return ndimage.gaussian_filter(heightmap, sigma=sigma)
+    heightmap = np.asarray(heightmap, dtype=np.float32)
+    return ndimage.gaussian_filter(heightmap, sigma=sigma, truncate=3.0)
 
 
 def normalize_heightmap(heightmap, min_val=0.0, max_val=1.0):
     """
     Normalize heightmap to specified range
-    
+
     Args:
         heightmap: Input heightmap array
         min_val: Minimum value
         max_val: Maximum value
-        
+
     Returns:
         Normalized heightmap
     """
     h_min = np.min(heightmap)
     h_max = np.max(heightmap)
-    
+
     if h_max == h_min:
-        return np.full_like(heightmap, min_val)
-    
-    normalized = (heightmap - h_min) / (h_max - h_min)
-    return normalized * (max_val - min_val) + min_val
+        return np.full(heightmap.shape, min_val, dtype=np.float32)
+
+    # Single scratch buffer, updated in place instead of one temporary
+    # per arithmetic step
+    normalized = np.empty(heightmap.shape, dtype=np.float32)
+    np.subtract(heightmap, h_min, out=normalized)
+    np.multiply(normalized, (max_val - min_val) / (h_max - h_min), out=normalized)
+    if min_val != 0.0:
+        np.add(normalized, min_val, out=normalized)
+    return normalized
+
+
+def normalize_to_uint16(heightmap, invalid_mask=None):
+    """
+    Normalize an elevation array and quantize to 16-bit in one fused pass
+
+    Args:
+        heightmap: Input elevation array (NaNs are mapped to 0)
+        invalid_mask: Optional boolean nodata mask; masked cells are
+            excluded from the elevation range and written as 0
+
+    Returns:
+        (heightmap_16bit, min_val, max_val) tuple
+    """
+    if invalid_mask is not None and invalid_mask.any():
+        valid_values = heightmap[~invalid_mask]
+        if valid_values.size == 0:
+            return np.zeros(heightmap.shape, dtype=np.uint16), 0.0, 0.0
+        min_val = float(np.nanmin(valid_values))
+        max_val = float(np.nanmax(valid_values))
+    else:
+        min_val = float(np.nanmin(heightmap))
+        max_val = float(np.nanmax(heightmap))
+
+    if max_val == min_val:
+        return np.zeros(heightmap.shape, dtype=np.uint16), min_val, max_val
+
+    # One float32 scratch buffer reused for every step, then a single cast
+    scratch = np.empty(heightmap.shape, dtype=np.float32)
+    np.subtract(heightmap, np.float32(min_val), out=scratch)
+    np.multiply(scratch, np.float32(65535.0 / (max_val - min_val)), out=scratch)
+    np.nan_to_num(scratch, copy=False, nan=0.0)
+    if invalid_mask is not None:
+        scratch[invalid_mask] = 0.0
+    return scratch.astype(np.uint16), min_val, max_val
 
 
 def resize_heightmap(heightmap, target_size):
@@ -62,17 +108,34 @@ def resize_heightmap(heightmap, target_size):
 def save_heightmap_16bit(heightmap, output_path):
     """
     Save heightmap as 16-bit PNG
-    
+
+    Heightmaps whose data occupies 256 or fewer distinct levels are
+    written as 8-bit grayscale instead - half the file size and encode
+    time - but only when every level survives the requantization, so
+    the downgrade never loses precision.
+
     Args:
         heightmap: Input heightmap array (0-1 range)
         output_path: Output file path
     """
     # Convert to 16-bit
     heightmap_16bit = (heightmap * 65535).astype(np.uint16)
+
+    # Low-relief terrain collapses to few levels; 16 bits buy nothing
+    # then. Few levels alone isn't enough though - distinct 16-bit values
+    # can still land in the same 8-bit bin, so check the actual 8-bit
+    # quantization keeps them apart before downgrading
+    levels_16 = np.unique(heightmap_16bit).size
+    if levels_16 <= 256:
+        levels_8 = np.unique((heightmap * 255).astype(np.uint8)).size
+        if levels_8 == levels_16:
+            save_heightmap_8bit(heightmap, output_path)
+            return
     
-    # Save as PNG
+    # Save as PNG (zlib level 3 - heightmaps are written once and consumed
+    # once, so heavy compression buys nothing)
     image = Image.fromarray(heightmap_16bit, mode='I;16')
-    image.save(output_path)
+    image.save(output_path, 'PNG', compress_level=3, optimize=False)
 
 
 def save_heightmap_8bit(heightmap, output_path):
@@ -86,6 +149,6 @@ def save_heightmap_8bit(heightmap, output_path):
     # Convert to 8-bit
     heightmap_8bit = (heightmap * 255).astype(np.uint8)
     
-    # Save as PNG
+    # Save as PNG (zlib level 3, see save_heightmap_16bit)
     image = Image.fromarray(heightmap_8bit, mode='L')
-    image.save(output_path)
+    image.save(output_path, 'PNG', compress_level=3, optimize=False)
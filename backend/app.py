@@ -6,14 +6,19 @@ Handles geocoding, DEM downloads, and heightmap generation
 
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
+from flask_compress import Compress
+import base64
+import glob
 import os
 import requests
 from osgeo import gdal
 import numpy as np
 from PIL import Image
-from scipy.interpolate import griddata
-from scipy.ndimage import gaussian_filter
+from scipy.ndimage import distance_transform_edt, gaussian_filter
 import tempfile
+import threading
+from contextlib import contextmanager
+import time
 import logging
 from werkzeug.utils import secure_filename
 import uuid
@@ -22,8 +27,41 @@ from datetime import datetime
 # Enable GDAL exceptions
 gdal.UseExceptions()
 
+# GDAL tuning: bounded block cache, threaded tile decompression and a
+# VSI read cache for compressed GeoTIFFs
+gdal.SetConfigOption('GDAL_CACHEMAX', os.environ.get('GDAL_CACHEMAX', '512'))
+gdal.SetConfigOption('GDAL_NUM_THREADS', 'ALL_CPUS')
+gdal.SetConfigOption('VSI_CACHE', 'TRUE')
+
+
+@contextmanager
+def open_dataset(dem_path, access=gdal.GA_ReadOnly):
+    """Open a GDAL dataset, dropping the wrapper's reference on exit;
+    callers must still let their own binding die (or del it) to release
+    the underlying file"""
+    dataset = gdal.Open(dem_path, access)
+    try:
+        yield dataset
+    finally:
+        dataset = None
+
 app = Flask(__name__)
-CORS(app)  # Enable CORS for Unity WebGL
+
+# CORS for Unity WebGL - origins come from the environment (comma
+# separated) so deployments can pin the Unity build's host; preflights
+# are cacheable for a day instead of re-validated per request
+ALLOWED_ORIGINS = [o.strip() for o in os.environ.get('ALLOWED_ORIGINS', '*').split(',')]
+CORS(
+    app,
+    resources={r"/api/*": {"origins": ALLOWED_ORIGINS}, r"/health": {"origins": ALLOWED_ORIGINS}},
+    max_age=86400
+)
+
+# Compress responses in transit (brotli preferred, gzip fallback) -
+# smooth-terrain heightmap PNGs shrink substantially under brotli
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'image/png']
+Compress(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +83,18 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 OPENTOPO_API_KEY = os.environ.get('OPENTOPO_API_KEY', '')
 OPENTOPO_BASE_URL = 'https://portal.opentopography.org/API/globaldem'
 
+# Shared session for outbound calls (Nominatim, OpenTopography) - keeps
+# connections alive instead of paying a TCP+TLS handshake per request
+http_session = requests.Session()
+
+# Geocoding cache: normalized location -> (timestamp, payload). Repeated
+# lookups of the same place skip the Nominatim round-trip (and its rate
+# limits) for a day.
+GEOCODE_CACHE_TTL = 86400  # seconds
+GEOCODE_CACHE_MAX = 10000
+_geocode_cache = {}
+_geocode_cache_lock = threading.Lock()
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -74,7 +124,14 @@ def geocode():
         
         if not location:
             return jsonify({'error': 'Location parameter is required'}), 400
-        
+
+        # Serve repeated lookups from the cache
+        cache_key = location.strip().lower()
+        with _geocode_cache_lock:
+            cached = _geocode_cache.get(cache_key)
+            if cached is not None and time.time() - cached[0] < GEOCODE_CACHE_TTL:
+                return jsonify(cached[1])
+
         # Use Nominatim API for geocoding
         url = 'https://nominatim.openstreetmap.org/search'
         params = {
@@ -86,7 +143,7 @@ def geocode():
             'User-Agent': 'Plantopia Unity App/1.0'
         }
         
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = http_session.get(url, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         
         results = response.json()
@@ -95,13 +152,21 @@ def geocode():
             return jsonify({'error': f'Location not found: {location}'}), 404
         
         result = results[0]
-        
-        return jsonify({
+
+        payload = {
             'latitude': float(result['lat']),
             'longitude': float(result['lon']),
             'display_name': result.get('display_name', location),
             'boundingbox': result.get('boundingbox', [])
-        })
+        }
+
+        with _geocode_cache_lock:
+            # Evict the oldest entry once full (insertion-ordered dict)
+            if len(_geocode_cache) >= GEOCODE_CACHE_MAX:
+                _geocode_cache.pop(next(iter(_geocode_cache)))
+            _geocode_cache[cache_key] = (time.time(), payload)
+
+        return jsonify(payload)
         
     except requests.RequestException as e:
         logger.error(f"Geocoding request failed: {e}")
@@ -125,14 +190,26 @@ def download_dem():
     Returns: {"file_id": "uuid", "message": "DEM downloaded successfully"}
     """
     try:
-        data = request.get_json()
+        result, status = _download_dem_op(request.get_json() or {})
+        return jsonify(result), status
+    except Exception as e:
+        logger.error(f"DEM download error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _download_dem_op(data):
+    """
+    Download a DEM for the given parameters; returns (payload, status)
+    Shared by /api/download-dem and /api/batch
+    """
+    try:
         latitude = data.get('latitude')
         longitude = data.get('longitude')
         radius_km = data.get('radius_km', 10)
         dem_type = data.get('dem_type', 'SRTMGL1')
         
         if latitude is None or longitude is None:
-            return jsonify({'error': 'Latitude and longitude are required'}), 400
+            return {'error': 'Latitude and longitude are required'}, 400
         
         # Calculate bounding box
         # Approximate: 1 degree latitude ≈ 111 km
@@ -148,7 +225,7 @@ def download_dem():
         # Check API key
         api_key = OPENTOPO_API_KEY or data.get('api_key')
         if not api_key:
-            return jsonify({'error': 'OpenTopography API key not configured'}), 500
+            return {'error': 'OpenTopography API key not configured'}, 500
         
         # Build OpenTopography API request
         params = {
@@ -163,37 +240,66 @@ def download_dem():
         
         logger.info(f"Downloading DEM: {dem_type} for bbox ({south},{west}) to ({north},{east})")
         
-        response = requests.get(OPENTOPO_BASE_URL, params=params, timeout=120)
-        response.raise_for_status()
-        
         # Generate unique file ID
         file_id = str(uuid.uuid4())
         output_path = os.path.join(UPLOAD_FOLDER, f'dem_{file_id}.tif')
-        
-        # Save DEM file
-        with open(output_path, 'wb') as f:
-            f.write(response.content)
-        
-        logger.info(f"DEM saved: {output_path} ({len(response.content)} bytes)")
-        
-        return jsonify({
+
+        # Stream the GeoTIFF straight to disk in 1MB chunks so a 500MB DEM
+        # never has to fit in memory
+        size_bytes = 0
+        with http_session.get(OPENTOPO_BASE_URL, params=params, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            with open(output_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+                    size_bytes += len(chunk)
+
+        logger.info(f"DEM saved: {output_path} ({size_bytes} bytes)")
+
+        # Build pyramid overviews once so processing can decode a reduced
+        # level instead of the full-resolution raster on every request
+        try:
+            with open_dataset(output_path, gdal.GA_Update) as dataset:
+                dataset.BuildOverviews('AVERAGE', [2, 4, 8, 16])
+                # Compute band statistics once; GDAL persists them so later
+                # min/max lookups don't have to sweep the raster
+                dataset.GetRasterBand(1).ComputeStatistics(False)
+        except Exception as e:
+            logger.warning(f"Overview generation failed (continuing without): {e}")
+        
+        return {
             'file_id': file_id,
             'message': 'DEM downloaded successfully',
-            'size_bytes': len(response.content),
+            'size_bytes': size_bytes,
             'bbox': {
                 'south': south,
                 'north': north,
                 'west': west,
                 'east': east
             }
-        })
-        
+        }, 200
+
     except requests.RequestException as e:
         logger.error(f"DEM download failed: {e}")
-        return jsonify({'error': f'DEM download failed: {str(e)}'}), 500
-    except Exception as e:
-        logger.error(f"DEM download error: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': f'DEM download failed: {str(e)}'}, 500
+
+
+@app.route('/api/dem/<file_id>', methods=['GET', 'HEAD'])
+def dem_exists(file_id):
+    """
+    Check whether a downloaded DEM is still on disk
+    GET/HEAD /api/dem/<file_id>
+    Returns: {"file_id": "uuid", "size_bytes": 123} or 404
+    Lets clients revalidate a remembered file_id with one cheap request
+    instead of re-downloading the DEM.
+    """
+    dem_path = os.path.join(UPLOAD_FOLDER, f'dem_{file_id}.tif')
+    if not os.path.exists(dem_path):
+        return jsonify({'error': f'DEM file not found: {file_id}'}), 404
+    return jsonify({
+        'file_id': file_id,
+        'size_bytes': os.path.getsize(dem_path)
+    }), 200
 
 
 @app.route('/api/process-dem', methods=['POST'])
@@ -211,91 +317,120 @@ def process_dem():
         data = request.get_json()
         file_id = data.get('file_id')
         resolution = data.get('resolution', 513)
-        
-        if not file_id:
-            return jsonify({'error': 'file_id is required'}), 400
-        
-        # Validate resolution
-        if resolution not in [129, 257, 513, 1025, 2049, 4097]:
-            return jsonify({'error': 'Invalid resolution. Must be 2^n + 1'}), 400
-        
-        # Find DEM file
-        dem_path = os.path.join(UPLOAD_FOLDER, f'dem_{file_id}.tif')
-        if not os.path.exists(dem_path):
-            return jsonify({'error': f'DEM file not found: {file_id}'}), 404
-        
-        logger.info(f"Processing DEM: {dem_path} to {resolution}x{resolution}")
-        
-        # Process DEM to heightmap
-        heightmap_path = process_dem_to_heightmap(dem_path, resolution)
-        
-        # Return heightmap file
+
+        cache_path, error, status = _prepare_heightmap(file_id, resolution)
+        if error is not None:
+            return jsonify(error), status
+
+        # Stable ETag lets Unity WebGL clients revalidate with a 304
         return send_file(
-            heightmap_path,
+            cache_path,
             mimetype='image/png',
             as_attachment=True,
-            download_name=f'heightmap_{file_id}.png'
+            download_name=f'heightmap_{file_id}.png',
+            etag=f'{file_id}_{resolution}',
+            conditional=True
         )
-        
+
     except Exception as e:
         logger.error(f"DEM processing error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def _prepare_heightmap(file_id, resolution):
+    """
+    Validate inputs and ensure a cached heightmap PNG exists
+    Returns (cache_path, error_payload, status); error_payload is None
+    on success. Shared by /api/process-dem and /api/batch.
+    """
+    if not file_id:
+        return None, {'error': 'file_id is required'}, 400
+
+    # Validate resolution
+    if resolution not in [129, 257, 513, 1025, 2049, 4097]:
+        return None, {'error': 'Invalid resolution. Must be 2^n + 1'}, 400
+
+    # Find DEM file
+    dem_path = os.path.join(UPLOAD_FOLDER, f'dem_{file_id}.tif')
+    if not os.path.exists(dem_path):
+        return None, {'error': f'DEM file not found: {file_id}'}, 404
+
+    # Each DEM has at most one output per allowed resolution, so cache
+    # the PNG on disk and serve repeats without reprocessing
+    cache_path = os.path.join(CACHE_FOLDER, f'heightmap_{file_id}_{resolution}.png')
+
+    if os.path.exists(cache_path):
+        logger.info(f"Serving cached heightmap: {cache_path}")
+    else:
+        logger.info(f"Processing DEM: {dem_path} to {resolution}x{resolution}")
+        heightmap_path = process_dem_to_heightmap(dem_path, resolution)
+        # Atomic publish so concurrent requests never see a partial file
+        os.replace(heightmap_path, cache_path)
+
+    return cache_path, None, 200
+
+
 def process_dem_to_heightmap(dem_path, resolution):
     """
     Convert DEM GeoTIFF to heightmap PNG using GDAL
     """
     try:
-        # Open DEM with GDAL
-        dataset = gdal.Open(dem_path)
-        if dataset is None:
-            raise Exception(f"Failed to open DEM file: {dem_path}")
-        
-        # Read elevation band - use ReadAsArray directly without gdal_array module
-        band = dataset.GetRasterBand(1)
-        elevation_data = band.ReadAsArray()
-        
-        if elevation_data is None:
-            raise Exception("Failed to read elevation data from DEM")
-        
-        # Convert to float32 for processing
-        elevation_data = elevation_data.astype(np.float32)
-        
-        # Get NoData value
-        nodata = band.GetNoDataValue()
-        
-        # Close dataset to free resources
-        band = None
-        dataset = None
-        
-        # Handle NoData values
+        # Open DEM with GDAL (released on every exit path)
+        with open_dataset(dem_path) as dataset:
+            if dataset is None:
+                raise Exception(f"Failed to open DEM file: {dem_path}")
+
+            # Read elevation band - use ReadAsArray directly without gdal_array module
+            band = dataset.GetRasterBand(1)
+
+            # Prefer the smallest overview that still covers the target
+            # resolution; each level cuts the bytes decoded by 4x
+            read_band = band
+            for level in range(band.GetOverviewCount()):
+                overview = band.GetOverview(level)
+                if overview.XSize >= resolution and overview.YSize >= resolution:
+                    read_band = overview
+                else:
+                    break
+
+            elevation_data = read_band.ReadAsArray()
+
+            if elevation_data is None:
+                raise Exception("Failed to read elevation data from DEM")
+
+            # Get NoData value
+            nodata = band.GetNoDataValue()
+
+        # The context manager only clears its own reference - drop the
+        # local bindings too so the raster is released before the heavy
+        # fill/blur/resize work below, like the explicit nulling before it
+        del band, read_band, dataset
+
+        # Convert to contiguous float32 at the boundary so every later
+        # pass (fill, blur, normalize) stays in fp32 and nothing silently
+        # upcasts to float64, doubling memory bandwidth
+        elevation_data = np.ascontiguousarray(elevation_data, dtype=np.float32)
+
+
+        # Flag invalid cells with a boolean mask - writing NaNs through
+        # np.where would force another full float copy of the raster
+        invalid_mask = np.isnan(elevation_data)
         if nodata is not None:
-            elevation_data = np.where(
-                elevation_data == nodata,
-                np.nan,
-                elevation_data
-            )
-        
-        # Fill NaN values with interpolation
-        if np.any(np.isnan(elevation_data)):
-            mask = ~np.isnan(elevation_data)
-            coords = np.array(np.nonzero(mask)).T
-            values = elevation_data[mask]
-            
-            if len(values) > 0:
-                # Create grid for all points
-                grid_y, grid_x = np.mgrid[0:elevation_data.shape[0], 0:elevation_data.shape[1]]
-                
-                # Interpolate
-                elevation_data = griddata(
-                    coords, values,
-                    (grid_y, grid_x),
-                    method='linear',
-                    fill_value=float(np.nanmean(values))
-                )
-            else:
+            invalid_mask |= elevation_data == nodata
+
+        # Fill invalid cells with nearest-neighbor fill via a distance
+        # transform - a single O(N) sweep instead of griddata's Delaunay
+        # triangulation over every known pixel
+        if np.any(invalid_mask):
+            if np.all(invalid_mask):
                 elevation_data = np.zeros_like(elevation_data)
+            else:
+                indices = distance_transform_edt(
+                    invalid_mask,
+                    return_distances=False,
+                    return_indices=True
+                )
+                elevation_data = elevation_data[tuple(indices)]
         
         # Apply moderate Gaussian smoothing to reduce noise while preserving features
         elevation_data = gaussian_filter(elevation_data, sigma=0.8)
@@ -307,51 +442,41 @@ def process_dem_to_heightmap(dem_path, resolution):
         logger.info(f"Elevation range: {min_elevation:.2f}m to {max_elevation:.2f}m")
         
         if max_elevation > min_elevation:
-            normalized = (elevation_data - min_elevation) / (max_elevation - min_elevation)
+            # Normalize in place - the filtered array is already a private
+            # float32 buffer, so no temporaries are needed
+            normalized = elevation_data
+            np.subtract(normalized, np.float32(min_elevation), out=normalized)
+            np.multiply(normalized, np.float32(1.0 / (max_elevation - min_elevation)), out=normalized)
         else:
             normalized = np.zeros_like(elevation_data)
         
-        # Resize to target resolution using PIL with high-quality resampling
-        image = Image.fromarray((normalized * 255).astype(np.uint8), mode='L')
+        # Resize the float heightmap directly (mode 'F') so elevation is
+        # never quantized to 256 levels on the way to a 16-bit output
+        image = Image.fromarray(normalized, mode='F')
         image = image.resize((resolution, resolution), Image.Resampling.LANCZOS)
-        
+
         # Apply moderate smoothing to reduce resize artifacts and noise
-        image_array = np.array(image).astype(np.float32)
+        image_array = np.asarray(image, dtype=np.float32)
         image_array = gaussian_filter(image_array, sigma=0.4)  # Balanced smoothing for high-res terrain
+
+        # Convert to 16-bit for better precision (clip Lanczos over/undershoot)
+        image_16bit = Image.fromarray(
+            np.clip(image_array * 65535.0, 0, 65535).astype(np.uint16)
+        )
         
-        # Convert to 16-bit for better precision
-        image_16bit = Image.fromarray((image_array / 255.0 * 65535).astype(np.uint16))
-        
-        # Save heightmap
-        output_path = dem_path.replace('.tif', '_heightmap.png')
-        image_16bit.save(output_path, 'PNG')
-        
-        logger.info(f"Heightmap created: {output_path} (Range: {min_elevation:.2f}m to {max_elevation:.2f}m)")
-        
-        return output_path
-        
-    except Exception as e:
-        logger.error(f"Error processing DEM to heightmap: {e}")
-        raise
-        
-        # Apply slight smoothing after resize to reduce artifacts
-        image_array = np.array(image).astype(np.float32)
-        image_array = gaussian_filter(image_array, sigma=0.5)
-        
-        # Convert to 16-bit for better precision
-        image_16bit = Image.fromarray((image_array / 255.0 * 65535).astype(np.uint16))
-        
-        # Save heightmap
-        output_path = dem_path.replace('.tif', '_heightmap.png')
-        image_16bit.save(output_path, 'PNG')
-        
-        # Close dataset
-        dataset = None
-        
+        # Save heightmap (zlib level 3 - written once, downloaded once).
+        # Write under CACHE_FOLDER so the caller's os.replace publish is a
+        # same-directory rename - temp/ and cache/ are separate bind
+        # mounts in the Docker setup, where a cross-directory rename
+        # fails with EXDEV
+        fd, output_path = tempfile.mkstemp(suffix='.png', dir=CACHE_FOLDER)
+        os.close(fd)
+        image_16bit.save(output_path, 'PNG', compress_level=3, optimize=False)
+
         logger.info(f"Heightmap created: {output_path} (Range: {min_elevation:.2f}m to {max_elevation:.2f}m)")
-        
+
         return output_path
-        
+
     except Exception as e:
         logger.error(f"Error processing DEM to heightmap: {e}")
         raise
@@ -377,39 +502,22 @@ def process_dem_info():
             return jsonify({'error': f'DEM file not found: {file_id}'}), 404
         
         # Read DEM metadata with GDAL
-        dataset = gdal.Open(dem_path, gdalconst.GA_ReadOnly)
-        if dataset is None:
-            return jsonify({'error': f'Failed to open DEM file: {file_id}'}), 500
-        
-        band = dataset.GetRasterBand(1)
-        elevation_data = band.ReadAsArray().astype(np.float32)
-        
-        # Handle NoData
-        nodata = band.GetNoDataValue()
-        if nodata is not None:
-            elevation_data = np.where(
-                elevation_data == nodata,
-                np.nan,
-                elevation_data
-            )
-        
-        min_elev = float(np.nanmin(elevation_data))
-        max_elev = float(np.nanmax(elevation_data))
-        
-        # Get geotransform and projection
-        geotransform = dataset.GetGeoTransform()
-        projection = dataset.GetProjection()
-        
-        result = {
-            'min_elevation': min_elev,
-            'max_elevation': max_elev,
-            'size': [dataset.RasterYSize, dataset.RasterXSize],
-            'projection': projection
-        }
-        
-        # Close dataset
-        dataset = None
-        
+        with open_dataset(dem_path) as dataset:
+            if dataset is None:
+                return jsonify({'error': f'Failed to open DEM file: {file_id}'}), 500
+
+            # Min/max come from the statistics computed at download time
+            # (nodata-aware); no need to read the raster at all
+            band = dataset.GetRasterBand(1)
+            min_elev, max_elev, _, _ = band.GetStatistics(True, True)
+
+            result = {
+                'min_elevation': min_elev,
+                'max_elevation': max_elev,
+                'size': [dataset.RasterYSize, dataset.RasterXSize],
+                'projection': dataset.GetProjection()
+            }
+
         return jsonify(result)
             
     except Exception as e:
@@ -426,35 +534,110 @@ def cleanup():
     """
     try:
         data = request.get_json()
-        file_id = data.get('file_id')
-        
-        if not file_id:
-            return jsonify({'error': 'file_id is required'}), 400
-        
-        # Delete associated files
-        patterns = [
-            f'dem_{file_id}.tif',
-            f'dem_{file_id}_heightmap.png'
-        ]
-        
-        deleted = []
-        for pattern in patterns:
-            file_path = os.path.join(UPLOAD_FOLDER, pattern)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                deleted.append(pattern)
-                logger.info(f"Deleted: {file_path}")
-        
-        return jsonify({
-            'message': f'Cleaned up {len(deleted)} file(s)',
-            'deleted': deleted
-        })
-        
+        result, status = _cleanup_op(data.get('file_id'))
+        return jsonify(result), status
+
     except Exception as e:
         logger.error(f"Cleanup error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def _cleanup_op(file_id):
+    """
+    Delete all files associated with a DEM; returns (payload, status)
+    Shared by /api/cleanup and /api/batch
+    """
+    if not file_id:
+        return {'error': 'file_id is required'}, 400
+
+    # Delete associated files
+    patterns = [
+        f'dem_{file_id}.tif',
+        f'dem_{file_id}_heightmap.png'
+    ]
+
+    deleted = []
+    for pattern in patterns:
+        file_path = os.path.join(UPLOAD_FOLDER, pattern)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            deleted.append(pattern)
+            logger.info(f"Deleted: {file_path}")
+
+    # Drop any cached heightmaps generated from this DEM
+    for file_path in glob.glob(os.path.join(CACHE_FOLDER, f'heightmap_{file_id}_*.png')):
+        os.remove(file_path)
+        deleted.append(os.path.basename(file_path))
+        logger.info(f"Deleted: {file_path}")
+
+    return {
+        'message': f'Cleaned up {len(deleted)} file(s)',
+        'deleted': deleted
+    }, 200
+
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """
+    Run several pipeline operations in one round-trip
+    POST /api/batch
+    Body: [
+        {"op": "download-dem", "latitude": 36.09, "longitude": -112.09, ...},
+        {"op": "process-dem", "resolution": 513},
+        {"op": "cleanup"}
+    ]
+    Returns: JSON array with {"op", "status", "result"} per operation.
+    The file_id produced by download-dem is threaded into later ops that
+    omit it; process-dem results carry the PNG base64-encoded under
+    'heightmap_b64'.
+    """
+    try:
+        ops = request.get_json()
+        if not isinstance(ops, list) or not ops:
+            return jsonify({'error': 'Body must be a non-empty JSON array of operations'}), 400
+
+        results = []
+        file_id = None
+
+        for op_spec in ops:
+            op = op_spec.get('op')
+            op_file_id = op_spec.get('file_id', file_id)
+
+            if op == 'download-dem':
+                result, status = _download_dem_op(op_spec)
+                if status == 200:
+                    file_id = result['file_id']
+            elif op == 'process-dem':
+                cache_path, error, status = _prepare_heightmap(
+                    op_file_id, op_spec.get('resolution', 513))
+                if error is not None:
+                    result = error
+                else:
+                    with open(cache_path, 'rb') as f:
+                        png_bytes = f.read()
+                    result = {
+                        'file_id': op_file_id,
+                        'size_bytes': len(png_bytes),
+                        'heightmap_b64': base64.b64encode(png_bytes).decode('ascii')
+                    }
+            elif op == 'cleanup':
+                result, status = _cleanup_op(op_file_id)
+            else:
+                result, status = {'error': f'Unknown op: {op}'}, 400
+
+            results.append({'op': op, 'status': status, 'result': result})
+
+            # Later steps consume earlier outputs; stop at first failure
+            if status != 200:
+                break
+
+        return jsonify(results)
+
+    except Exception as e:
+        logger.error(f"Batch error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 if __name__ == '__main__':
     # Development server
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers
+Run with: gunicorn -k gevent -w 4 --worker-connections 200 wsgi:app
+"""
+
+from app import app
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', port=5000)
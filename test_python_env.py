@@ -3,95 +3,122 @@ Test script to verify rasterio installation and basic DEM processing
 Run this to make sure everything is working before using in Unity
 """
 
+import functools
+import importlib.util
+import io
+import pathlib
 import sys
-import os
+from concurrent.futures import ThreadPoolExecutor
 
-def test_imports():
-    """Test that all required packages are importable"""
-    print("=" * 60)
-    print("Testing Python Package Imports")
-    print("=" * 60)
-    
+def test_imports(out=sys.stdout):
+    """Test that all required packages are installed"""
+    print("=" * 60, file=out)
+    print("Testing Python Package Imports", file=out)
+    print("=" * 60, file=out)
+
+    # Probe with find_spec instead of importing - checking existence
+    # doesn't need to run numpy/rasterio's heavy C-extension init
+    # (rasterio gets actually imported in its capability test anyway)
     packages = [
         ('numpy', 'Array processing'),
-        ('PIL', 'Image handling (Pillow)'),
+        ('PIL.Image', 'Image handling (Pillow)'),
         ('scipy', 'Scientific computing'),
         ('rasterio', 'GeoTIFF reading')
     ]
-    
+
     all_ok = True
-    
+
     for package_name, description in packages:
         try:
-            __import__(package_name)
-            print(f"✅ {package_name:15} - {description}")
-        except ImportError as e:
-            print(f"❌ {package_name:15} - MISSING! {str(e)}")
+            found = importlib.util.find_spec(package_name) is not None
+        except ImportError:
+            # find_spec on a dotted name raises if the parent is missing
+            found = False
+
+        if found:
+            print(f"✅ {package_name:15} - {description}", file=out)
+        else:
+            print(f"❌ {package_name:15} - MISSING!", file=out)
             all_ok = False
-    
-    print()
+
+    print(file=out)
     return all_ok
 
 
-def test_rasterio_capabilities():
+@functools.lru_cache(maxsize=1)
+def _raster_driver_extensions():
+    """Driver listing walks GDAL's registry over FFI - cache it so looped
+    reruns of the capability test pay the traversal once"""
+    import rasterio
+    return rasterio.drivers.raster_driver_extensions()
+
+
+def test_rasterio_capabilities(out=sys.stdout):
     """Test rasterio specific features"""
-    print("=" * 60)
-    print("Testing Rasterio Capabilities")
-    print("=" * 60)
+    print("=" * 60, file=out)
+    print("Testing Rasterio Capabilities", file=out)
+    print("=" * 60, file=out)
     
     try:
         import rasterio
-        print(f"✅ Rasterio version: {rasterio.__version__}")
-        print(f"✅ GDAL version: {rasterio.__gdal_version__}")
+        print(f"✅ Rasterio version: {rasterio.__version__}", file=out)
+        print(f"✅ GDAL version: {rasterio.__gdal_version__}", file=out)
         
         # List supported drivers
-        drivers = rasterio.drivers.raster_driver_extensions()
-        print(f"✅ Supported formats: GeoTIFF, {len(drivers)} total formats")
+        drivers = _raster_driver_extensions()
+        print(f"✅ Supported formats: GeoTIFF, {len(drivers)} total formats", file=out)
         
         return True
     except Exception as e:
-        print(f"❌ Rasterio test failed: {str(e)}")
+        print(f"❌ Rasterio test failed: {str(e)}", file=out)
         return False
 
 
-def test_create_sample_heightmap():
+def test_create_sample_heightmap(out=sys.stdout):
     """Create a simple test heightmap to verify image output works"""
-    print("=" * 60)
-    print("Testing Heightmap Generation")
-    print("=" * 60)
+    print("=" * 60, file=out)
+    print("Testing Heightmap Generation", file=out)
+    print("=" * 60, file=out)
     
     try:
         import numpy as np
         from PIL import Image
         
-        # Create simple gradient heightmap
+        # Create simple gradient heightmap via np.add.outer - one
+        # vectorized pass instead of ~263k interpreted loop iterations.
+        # (i + j) and the 65535 scale are exact in integer arithmetic, so
+        # the whole kernel stays in integer ALUs with no float buffer,
+        # and the out= scratch means no intermediate array is allocated
         resolution = 513
-        heightmap = np.zeros((resolution, resolution), dtype=np.float32)
-        
-        for i in range(resolution):
-            for j in range(resolution):
-                heightmap[i, j] = (i + j) / (2 * resolution)
+        idx = np.arange(resolution, dtype=np.uint32)
+        scratch = np.empty((resolution, resolution), dtype=np.uint32)
+        np.add.outer(idx, idx, out=scratch)
+        np.multiply(scratch, 65535, out=scratch)
+        np.floor_divide(scratch, 2 * resolution, out=scratch)
+        heightmap_16bit = scratch.astype(np.uint16, copy=False)
         
-        # Convert to 16-bit
-        heightmap_16bit = (heightmap * 65535).astype(np.uint16)
-        
-        # Save test image
+        # Save test image - frombuffer wraps the contiguous uint16 buffer
+        # directly, skipping fromarray's dtype inspection and the
+        # tobytes() copy
         output_path = "test_heightmap.png"
-        image = Image.fromarray(heightmap_16bit, mode='I;16')
-        image.save(output_path)
+        heightmap_16bit = np.ascontiguousarray(heightmap_16bit)
+        image = Image.frombuffer('I;16', (resolution, resolution),
+                                 heightmap_16bit, 'raw', 'I;16', 0, 1)
+        # The file only proves the write path works and is deleted right
+        # after, so use the cheapest zlib level instead of the default 6
+        image.save(output_path, format='PNG', compress_level=1, optimize=False)
         
-        print(f"✅ Created test heightmap: {output_path}")
-        print(f"✅ Size: {resolution}x{resolution}")
-        print(f"✅ Format: 16-bit grayscale PNG")
+        print(f"✅ Created test heightmap: {output_path}", file=out)
+        print(f"✅ Size: {resolution}x{resolution}", file=out)
+        print(f"✅ Format: 16-bit grayscale PNG", file=out)
         
-        # Clean up
-        if os.path.exists(output_path):
-            os.remove(output_path)
-            print(f"✅ Test file cleaned up")
+        # Clean up - one unlink syscall, no racy exists() stat first
+        pathlib.Path(output_path).unlink(missing_ok=True)
+        print(f"✅ Test file cleaned up", file=out)
         
         return True
     except Exception as e:
-        print(f"❌ Heightmap generation test failed: {str(e)}")
+        print(f"❌ Heightmap generation test failed: {str(e)}", file=out)
         return False
 
 
@@ -103,16 +130,27 @@ def main():
     print("╚" + "=" * 58 + "╝")
     print()
     
-    results = []
-    
-    # Test imports
-    results.append(("Package Imports", test_imports()))
-    
-    # Test rasterio
-    results.append(("Rasterio Features", test_rasterio_capabilities()))
-    
-    # Test heightmap generation
-    results.append(("Heightmap Generation", test_create_sample_heightmap()))
+    # Run the three tests on worker threads - the import-heavy ones
+    # release the GIL during C-extension/DLL loading, so numpy/rasterio
+    # init overlaps with the heightmap compute
+    tests = [
+        ("Package Imports", test_imports),
+        ("Rasterio Features", test_rasterio_capabilities),
+        ("Heightmap Generation", test_create_sample_heightmap)
+    ]
+
+    # Each test prints into its own buffer, flushed in order once the
+    # test finishes - concurrent sections would otherwise interleave
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        futures = []
+        for name, fn in tests:
+            buf = io.StringIO()
+            futures.append((name, buf, executor.submit(fn, buf)))
+        results = []
+        for name, buf, future in futures:
+            passed = future.result()
+            sys.stdout.write(buf.getvalue())
+            results.append((name, passed))
     
     # Summary
     print()